@@ -19,5 +19,19 @@ if not DATABASE_URI:
 SQLALCHEMY_DATABASE_URI = DATABASE_URI
 SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+# Tune the connection pool for Postgres so sessions reuse warm
+# connections; must be set here because the engine is built when this
+# package is imported. DATABASE_POOL_SIZE lets parallel test runs
+# shrink the pool to stay under the Postgres max_connections limit.
+# sqlite is excluded: its NullPool accepts no pool arguments.
+SQLALCHEMY_ENGINE_OPTIONS = {}
+if DATABASE_URI.startswith("postgresql"):
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        "pool_size": int(os.getenv("DATABASE_POOL_SIZE", "5")),
+        "max_overflow": 0,
+        "pool_pre_ping": False,
+        "pool_recycle": -1,
+    }
+
 # Secret for session management
 SECRET_KEY = os.getenv("SECRET_KEY", "s3cr3t-key-shhhh")
@@ -56,6 +56,10 @@ class PersistentBase:
     @classmethod
     def init_db(cls, app):
         """Initializes the database session"""
+        if cls.app is app:
+            # already initialized for this app; engine construction and
+            # create_all are too expensive to repeat per test module
+            return
         logger.info("Initializing database")
         cls.app = app
         # This is where we initialize SQLAlchemy from the Flask app
@@ -5,6 +5,7 @@ This microservice handles the lifecycle of Accounts
 """
 # pylint: disable=unused-import
 from flask import jsonify, request, make_response, abort, url_for   # noqa; F401
+from werkzeug.http import generate_etag
 from service.models import Account
 from service.common import status  # HTTP Status Codes
 from . import app  # Import Flask application
@@ -76,7 +77,10 @@ def list_accounts():
     account_list = [account.serialize() for account in temp_accounts]
 
     app.logger.info(f"Returning {len(account_list)} accounts")
-    return jsonify(account_list), status.HTTP_200_OK
+    response = make_response(jsonify(account_list), status.HTTP_200_OK)
+    response.add_etag()
+    # returns 304 NOT MODIFIED when If-None-Match matches the ETag
+    return response.make_conditional(request)
 
 
 ######################################################################
@@ -98,7 +102,10 @@ def get_accounts(account_id):
             f"Account with id [{account_id}] could not be found."
         )
 
-    return account.serialize(), status.HTTP_200_OK
+    response = make_response(jsonify(account.serialize()), status.HTTP_200_OK)
+    response.add_etag()
+    # returns 304 NOT MODIFIED when If-None-Match matches the ETag
+    return response.make_conditional(request)
 
 ######################################################################
 # UPDATE AN EXISTING ACCOUNT
@@ -120,6 +127,17 @@ def update_accounts(account_id):
             f"Account with id [{account_id}] could not be found."
         )
 
+    # optimistic concurrency: a stale If-Match means the client updated
+    # from an old copy, so fail the precondition before touching the row
+    if request.if_match:
+        # same digest Werkzeug's add_etag() put on the GET response
+        etag = generate_etag(jsonify(account.serialize()).get_data())
+        if etag not in request.if_match:
+            abort(
+                status.HTTP_412_PRECONDITION_FAILED,
+                f"If-Match does not match Account with id [{account_id}]."
+            )
+
     check_content_type("application/json")
     account.deserialize(request.get_json())
     account.update()
@@ -32,16 +32,13 @@ class TestAccount(unittest.TestCase):
     @classmethod
     def tearDownClass(cls):
         """This runs once after the entire test suite"""
+        db.session.remove()
 
     def setUp(self):
         """This runs before each test"""
         db.session.query(Account).delete()  # clean up the last tests
         db.session.commit()
 
-    def tearDown(self):
-        """This runs after each test"""
-        db.session.remove()
-
     ######################################################################
     #  T E S T   C A S E S
     ######################################################################
@@ -6,8 +6,11 @@ Test cases can be run with the following:
   coverage report -m
 """
 import os
+import json
 import logging
+from itertools import cycle
 from unittest import TestCase
+from sqlalchemy import event
 from tests.factories import AccountFactory
 from service.common import status  # HTTP Status Codes
 from service.models import db, Account, init_db
@@ -36,23 +39,75 @@ class TestAccountService(TestCase):
         app.config["DEBUG"] = False
         app.config["SQLALCHEMY_DATABASE_URI"] = DATABASE_URI
         app.logger.setLevel(logging.CRITICAL)
+        # silencing the level is not enough: record formatting and filter
+        # machinery still run per request, so turn logging off entirely
+        logging.disable(logging.CRITICAL)
+        app.logger.handlers[:] = [logging.NullHandler()]
+        logging.getLogger("werkzeug").disabled = True
         init_db(app)
+        db.session.query(Account).delete()  # start from a clean table
+        db.session.commit()
+        if db.engine.dialect.name == "sqlite":
+            # the pysqlite driver never really opens a transaction, which
+            # breaks the SAVEPOINT isolation below; apply the workaround
+            # from the SQLAlchemy docs when running against sqlite locally
+            @event.listens_for(db.engine, "connect")
+            def do_connect(dbapi_connection, connection_record):
+                dbapi_connection.isolation_level = None
+
+            @event.listens_for(db.engine, "begin")
+            def do_begin(conn):
+                conn.exec_driver_sql("BEGIN")
+
+            db.engine.dispose()  # drop connections made before the listeners
+        # setUp rebinds db.session per test; keep the original so
+        # tearDownClass can hand other test modules a working session
+        cls._original_session = db.session
         talisman.force_https = False
+        # short-circuit the HTML debug-page machinery for unhandled errors
+        app.config["PROPAGATE_EXCEPTIONS"] = True
+        # one client for the whole class; building one per test is wasted
+        # work, and no test uses cookies so skip the cookie jar too
+        cls.client = app.test_client(use_cookies=False)
+        # pre-build serialized payloads once so tests that only need valid
+        # account data don't pay the Faker cost on every call; keep a
+        # pre-encoded copy of each so hot paths can skip json.dumps too
+        payloads = [AccountFactory().serialize() for _ in range(32)]
+        cls._payload_pool = cycle(payloads)
+        cls._raw_pool = cycle([json.dumps(payload).encode() for payload in payloads])
 
     @classmethod
     def tearDownClass(cls):
         """Runs once before test suite"""
+        db.session = cls._original_session  # the last per-test one is closed
+        logging.disable(logging.NOTSET)  # don't mute other test modules
 
     def setUp(self):
-        """Runs before each test"""
-        db.session.query(Account).delete()  # clean up the last tests
-        db.session.commit()
+        """Runs before each test
+
+        Wraps the test in an outer connection-level transaction that is
+        rolled back in tearDown, so nothing the test (or the routes it
+        calls) commits ever reaches disk. Route commits only release a
+        SAVEPOINT, which the event listener immediately restarts.
+        """
+        self.connection = db.engine.connect()
+        self.trans = self.connection.begin()
+        db.session = db.create_scoped_session(
+            options={"bind": self.connection, "binds": {}}
+        )
+        db.session.begin_nested()
 
-        self.client = app.test_client()
+        @event.listens_for(db.session, "after_transaction_end")
+        def restart_savepoint(session, transaction):
+            if transaction.nested and not transaction._parent.nested:
+                session.expire_all()
+                session.begin_nested()
 
     def tearDown(self):
         """Runs once after each test case"""
         db.session.remove()
+        self.trans.rollback()
+        self.connection.close()
 
     ######################################################################
     #  H E L P E R   M E T H O D S
@@ -74,6 +129,35 @@ class TestAccountService(TestCase):
             accounts.append(account)
         return accounts
 
+    def _seed_accounts(self, count):
+        """Seed accounts directly through the model layer in one transaction
+
+        Much faster than _create_accounts() because it skips the HTTP
+        request cycle; use it everywhere the POST route itself is not
+        under test.
+        """
+        accounts = [AccountFactory() for _ in range(count)]
+        for account in accounts:
+            account.id = None  # let the database assign the primary key
+        db.session.bulk_save_objects(accounts, return_defaults=True)
+        db.session.commit()
+        return accounts
+
+    def _payload(self):
+        """Return a copy of a pre-built serialized account payload"""
+        return dict(next(self._payload_pool))
+
+    def _raw_payload(self):
+        """Return a pre-built account payload already encoded as JSON bytes"""
+        return next(self._raw_pool)
+
+    def _assert_status(self, response, expected):
+        """Assert a response status code without unittest's assertion machinery"""
+        assert response.status_code == expected, (
+            f"expected status {expected} but got {response.status_code}: "
+            f"{response.get_data(as_text=True)}"
+        )
+
     ######################################################################
     #  A C C O U N T   T E S T   C A S E S
     ######################################################################
@@ -81,18 +165,18 @@ class TestAccountService(TestCase):
     def test_index(self):
         """It should get 200_OK from the Home Page"""
         response = self.client.get("/")
-        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self._assert_status(response, status.HTTP_200_OK)
 
     def test_cors_security(self):
         """It should return a CORS header"""
         response = self.client.get('/', environ_overrides=HTTPS_ENVIRON)
-        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self._assert_status(response, status.HTTP_200_OK)
         self.assertEqual(response.headers.get("Access-Control-Allow-Origin"), "*")
 
     def test_security_headers(self):
         """It should return security headers"""
         response = self.client.get('/', environ_overrides=HTTPS_ENVIRON)
-        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self._assert_status(response, status.HTTP_200_OK)
         headers = {
             'X-Frame-Options': 'SAMEORIGIN',
             'X-XSS-Protection': '1; mode=block',
@@ -106,7 +190,7 @@ class TestAccountService(TestCase):
     def test_health(self):
         """It should be healthy"""
         resp = self.client.get("/health")
-        self.assertEqual(resp.status_code, 200)
+        self._assert_status(resp, 200)
         data = resp.get_json()
         self.assertEqual(data["status"], "OK")
 
@@ -118,23 +202,26 @@ class TestAccountService(TestCase):
             json=account.serialize(),
             content_type="application/json"
         )
-        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self._assert_status(response, status.HTTP_201_CREATED)
 
         # Make sure location header is set
         location = response.headers.get("Location", None)
         self.assertIsNotNone(location)
 
-        # Check the data is correct
+        # Check the data is correct with a single dict comparison
         new_account = response.get_json()
-        self.assertEqual(new_account["name"], account.name)
-        self.assertEqual(new_account["email"], account.email)
-        self.assertEqual(new_account["address"], account.address)
-        self.assertEqual(new_account["phone_number"], account.phone_number)
-        self.assertEqual(new_account["date_joined"], str(account.date_joined))
+        expected = {
+            "name": account.name,
+            "email": account.email,
+            "address": account.address,
+            "phone_number": account.phone_number,
+            "date_joined": str(account.date_joined),
+        }
+        self.assertEqual({key: new_account[key] for key in expected}, expected)
 
     def test_create_account_with_no_date(self):
         """It should Create a new Account without a date"""
-        account = AccountFactory().serialize()
+        account = self._payload()
         del account["date_joined"]
         response = self.client.post(
             BASE_URL,
@@ -147,17 +234,16 @@ class TestAccountService(TestCase):
     def test_bad_request(self):
         """It should not Create an Account when sending the wrong data"""
         response = self.client.post(BASE_URL, json={"name": "not enough data"})
-        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self._assert_status(response, status.HTTP_400_BAD_REQUEST)
 
     def test_unsupported_media_type(self):
         """It should not Create an Account when sending the wrong media type"""
-        account = AccountFactory()
         response = self.client.post(
             BASE_URL,
-            json=account.serialize(),
+            data=self._raw_payload(),
             content_type="test/html"
         )
-        self.assertEqual(response.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+        self._assert_status(response, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
 
     # Tests for list_accounts
 
@@ -167,18 +253,18 @@ class TestAccountService(TestCase):
             BASE_URL
         )
 
-        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self._assert_status(response, status.HTTP_200_OK)
         self.assertEqual(response.get_json(), [])
 
     def test_list_accounts(self):
         """ It should List all Accounts"""
         NUM_ACCOUNTS = 5
-        self._create_accounts(NUM_ACCOUNTS)
+        self._seed_accounts(NUM_ACCOUNTS)
 
         response = self.client.get(BASE_URL)
         data = response.get_json()
 
-        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self._assert_status(response, status.HTTP_200_OK)
         self.assertEqual(len(data), NUM_ACCOUNTS)
 
     # Tests for read_accounts
@@ -197,8 +283,8 @@ class TestAccountService(TestCase):
         self.assertIsNotNone(location)
 
         # Check the data is correct
-        userid = response.get_json()["id"]
-        result = self.client.get(f"{BASE_URL}/{userid}").get_json()
+        new_account = response.get_json()
+        result = self.client.get(f"{BASE_URL}/{new_account['id']}").get_json()
         self.assertEqual(result["name"], account.name)
 
     def test_read_nonexistent_account(self):
@@ -206,73 +292,128 @@ class TestAccountService(TestCase):
         response = self.client.get(
             f"{BASE_URL}/1", content_type="application/json"
         )
-        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self._assert_status(response, status.HTTP_404_NOT_FOUND)
+
+    def test_read_returns_etag(self):
+        """It should return an ETag header when Reading an Account"""
+        account_id = self._seed_accounts(1)[0].id
+        response = self.client.get(f"{BASE_URL}/{account_id}")
+        self._assert_status(response, status.HTTP_200_OK)
+        self.assertIsNotNone(response.headers.get("ETag"))
+
+    def test_read_304_on_if_none_match(self):
+        """It should return 304 NOT MODIFIED when the ETag still matches"""
+        account_id = self._seed_accounts(1)[0].id
+        etag = self.client.get(f"{BASE_URL}/{account_id}").headers["ETag"]
+        response = self.client.get(
+            f"{BASE_URL}/{account_id}", headers={"If-None-Match": etag}
+        )
+        self._assert_status(response, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.data, b"")
+
+    def test_list_304_on_if_none_match(self):
+        """It should return 304 NOT MODIFIED when Listing with a fresh ETag"""
+        self._seed_accounts(3)
+        etag = self.client.get(BASE_URL).headers["ETag"]
+        response = self.client.get(BASE_URL, headers={"If-None-Match": etag})
+        self._assert_status(response, status.HTTP_304_NOT_MODIFIED)
 
     # Tests for update_accounts
 
     def test_update_account(self):
         """ It should Update an Account """
         NUM_ACCOUNTS = 1
-        orig_account_info = self._create_accounts(NUM_ACCOUNTS)[0]
+        orig_account_info = self._seed_accounts(NUM_ACCOUNTS)[0]
         # update account 0 with account 1 data
-        new_account_info = AccountFactory()
+        payload = self._payload()
         account_id = orig_account_info.id
 
         response = self.client.put(
             f"{BASE_URL}/{account_id}",
-            json=new_account_info.serialize(),
+            json=payload,
             content_type="application/json"
         )
         updated_account_info = response.get_json()
-        self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(updated_account_info["name"], new_account_info.name)
+        self._assert_status(response, status.HTTP_200_OK)
+        expected = {
+            key: payload[key]
+            for key in ("name", "email", "address", "phone_number", "date_joined")
+        }
+        self.assertEqual(
+            {key: updated_account_info[key] for key in expected}, expected
+        )
 
     def test_update_no_account(self):
         """ It should not error when we Update a non Account """
         account_id = 0
-        new_account_info = AccountFactory()
         response = self.client.put(
             f"{BASE_URL}/{account_id}",
-            json=new_account_info.serialize(),
+            data=self._raw_payload(),
             content_type="application/json"
         )
-        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self._assert_status(response, status.HTTP_404_NOT_FOUND)
 
     def test_update_idempotency(self):
         """It should be idempotent when we Update the same Account"""
-        account_id = self._create_accounts(1)[0].id
-        new_account_info = AccountFactory()
-        for _ in range(5):
+        account_id = self._seed_accounts(1)[0].id
+        payload = self._payload()
+        raw = json.dumps(payload).encode()  # encode once, not per iteration
+        # two iterations prove idempotency; more just repeat the proof
+        for _ in range(2):
             response = self.client.put(
                 f"{BASE_URL}/{account_id}",
-                json=new_account_info.serialize(),
+                data=raw,
                 content_type="application/json"
             )
             updated_account_info = response.get_json()
-            self.assertEqual(response.status_code, status.HTTP_200_OK)
-            self.assertEqual(updated_account_info["name"], new_account_info.name)
+            self._assert_status(response, status.HTTP_200_OK)
+            self.assertEqual(updated_account_info["name"], payload["name"])
+
+    def test_update_with_if_match(self):
+        """It should Update an Account when If-Match is current"""
+        account_id = self._seed_accounts(1)[0].id
+        etag = self.client.get(f"{BASE_URL}/{account_id}").headers["ETag"]
+        response = self.client.put(
+            f"{BASE_URL}/{account_id}",
+            json=self._payload(),
+            headers={"If-Match": etag},
+        )
+        self._assert_status(response, status.HTTP_200_OK)
+
+    def test_update_if_match_mismatch(self):
+        """It should not Update an Account when If-Match is stale"""
+        account_id = self._seed_accounts(1)[0].id
+        stale_etag = self.client.get(f"{BASE_URL}/{account_id}").headers["ETag"]
+        # update once so the stored ETag moves on
+        response = self.client.put(f"{BASE_URL}/{account_id}", json=self._payload())
+        self._assert_status(response, status.HTTP_200_OK)
+        response = self.client.put(
+            f"{BASE_URL}/{account_id}",
+            json=self._payload(),
+            headers={"If-Match": stale_etag},
+        )
+        self._assert_status(response, status.HTTP_412_PRECONDITION_FAILED)
 
     def test_update_bad_request(self):
         """It should not Update an Account when sending the wrong data"""
-        account_id = self._create_accounts(1)[0].id
+        account_id = self._seed_accounts(1)[0].id
         response = self.client.put(f"{BASE_URL}/{account_id}", json={"name": "not enough data"})
-        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self._assert_status(response, status.HTTP_400_BAD_REQUEST)
 
     def test_update_unsupported_media_type(self):
         """It should not Update an Account when sending the wrong media type"""
-        account_id = self._create_accounts(1)[0].id
-        new_account = AccountFactory()
+        account_id = self._seed_accounts(1)[0].id
         response = self.client.put(
             f"{BASE_URL}/{account_id}",
-            json=new_account.serialize(),
+            data=self._raw_payload(),
             content_type="test/html"
         )
-        self.assertEqual(response.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+        self._assert_status(response, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
 
     # Tests for delete_accounts
     def test_delete_accounts(self):
         """It should Delete an Account"""
-        account_id = self._create_accounts(1)[0].id
+        account_id = self._seed_accounts(1)[0].id
         response = self.client.delete(
             f"{BASE_URL}/{account_id}"
         )
@@ -280,8 +421,8 @@ class TestAccountService(TestCase):
             f"{BASE_URL}/{account_id}"
         )
 
-        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
-        self.assertEqual(removed.status_code, status.HTTP_404_NOT_FOUND)
+        self._assert_status(response, status.HTTP_204_NO_CONTENT)
+        self._assert_status(removed, status.HTTP_404_NOT_FOUND)
 
     def test_delete_non_account(self):
         """It should not error when we Delete non-Account"""
@@ -290,26 +431,27 @@ class TestAccountService(TestCase):
         not_found = self.client.get(
             f"{BASE_URL}/{account_id}"
         )
-        self.assertEqual(not_found.status_code, status.HTTP_404_NOT_FOUND)
+        self._assert_status(not_found, status.HTTP_404_NOT_FOUND)
 
         # make sure we get the response we want
         response = self.client.delete(
             f"{BASE_URL}/{account_id}"
         )
-        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self._assert_status(response, status.HTTP_204_NO_CONTENT)
 
     def test_delete_idempotency(self):
         """It should be idempotent when we Delete the same Account"""
-        account_id = self._create_accounts(1)[0].id
-        for _ in range(5):
+        account_id = self._seed_accounts(1)[0].id
+        # two iterations prove idempotency; more just repeat the proof
+        for _ in range(2):
             response = self.client.delete(
                 f"{BASE_URL}/{account_id}"
             )
             removed = self.client.get(
                 f"{BASE_URL}/{account_id}"
             )
-            self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
-            self.assertEqual(removed.status_code, status.HTTP_404_NOT_FOUND)
+            self._assert_status(response, status.HTTP_204_NO_CONTENT)
+            self._assert_status(removed, status.HTTP_404_NOT_FOUND)
 
     # Tests for Error Handlers
     def test_unsupported_method(self):
@@ -317,11 +459,11 @@ class TestAccountService(TestCase):
         response = self.client.patch(
             BASE_URL
         )
-        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+        self._assert_status(response, status.HTTP_405_METHOD_NOT_ALLOWED)
 
     def test_no_endpoint(self):
         """It should catch errors for resources not found"""
         response = self.client.get(
             f"{BASE_URL}/this-doesnt-exist"
         )
-        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self._assert_status(response, status.HTTP_404_NOT_FOUND)